@@ -6,28 +6,25 @@
 # Customer Journey Mapping • Mission & Values • Trade Profit Calculator
 
 from __future__ import annotations
-import os, re, json, math, calendar, tempfile, uuid, datetime as dt
+import os, re, json, math, copy, shutil, calendar, tempfile, functools, hashlib, importlib.util, datetime as dt
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Optional, List, Dict, Any
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+# matplotlib and reportlab are imported inside the chart/PDF helpers, only when first needed
 
-# PDF (reportlab)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage, PageBreak
+# Optional outbound; requests is only imported by http_session() when a webhook is first sent
+HAS_REQUESTS = importlib.util.find_spec("requests") is not None
 
-# Optional outbound
 try:
-    import requests
+    import orjson  # optional: faster profile (de)serialisation
 except Exception:
-    requests = None
+    orjson = None
 
 try:
     import smtplib
@@ -40,44 +37,123 @@ APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 PROFILES_DIR = os.path.join(APP_ROOT, "data", "profiles")
 LOGOS_DIR    = os.path.join(APP_ROOT, "data", "logos")
 ASSETS_DIR   = os.path.join(APP_ROOT, "data", "assets")
+# every rerun (three stat calls when present) so a data dir removed while the server runs comes back
 for d in (PROFILES_DIR, LOGOS_DIR, ASSETS_DIR):
     os.makedirs(d, exist_ok=True)
 
 MONTHS = list(calendar.month_name)[1:]  # Jan..Dec
+MONTH_IDX = {m:i for i,m in enumerate(MONTHS)}  # Jan=0
 CUR_YEAR = dt.date.today().year
 CORE_FUNCTIONS = ["Sales & Marketing", "Operations", "Finance"]
 ROLE_COLUMNS = ["Function","Role","Person","FTE","ReportsTo","KPIs","Accountabilities","Notes"]
 REVENUE_COLUMNS = ["Stream","TargetValue","Notes"]
+STATUS_OPTIONS = ("Planned","In progress","Done")
+TASK_COLUMNS = ["title","assignee","due","status","include_in_report","notes","id"]
+WEBHOOK_WORKERS = 4  # background posters; the HTTP pool keeps one reusable connection per worker
+DEFAULT_JOURNEY = {"stages":["Awareness","Consideration","Purchase","Service","Loyalty"],
+                   "columns":["Actions","Touchpoints","Emotions","PainPoints","Solutions"],
+                   "data":{}}
 
 # ---------- Helpers ----------
+_SLUG_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
 def _slug(name: str)->str:
-    return re.sub(r"[^A-Za-z0-9._-]+","_", (name or "business")).strip("_") or "business"
+    return _SLUG_RE.sub("_", (name or "business")).strip("_") or "business"
 
-def storage_list_profiles()->list[str]:
+def _random_hex_tokens(n: int)->list[str]:
+    """n random 32-char hex tokens (uuid4().hex length) from a single urandom read."""
+    raw = os.urandom(16*n)
+    return [raw[i*16:(i+1)*16].hex() for i in range(n)]
+
+def _content_hash(obj)->str:
+    """Stable digest of a JSON-able object (dict key order ignored)."""
+    if orjson:
+        raw = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str)
+    else:
+        raw = json.dumps(obj, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _memo_by_hash(slot: str, h: str, build):
+    """Return the value kept in session_state[slot] if it was built for hash h; otherwise rebuild and keep it."""
+    hit = st.session_state.get(slot)
+    if hit is not None and hit[0]==h:
+        return hit[1]
+    val = build()
+    st.session_state[slot] = (h, val)
+    return val
+
+# each save renames a temp file into the directory and moves its mtime, so only the latest listing is worth keeping
+@st.cache_data(show_spinner=False, max_entries=2)
+def _list_profiles(dir_mtime_ns: int)->list[str]:
     return sorted([os.path.splitext(f)[0] for f in os.listdir(PROFILES_DIR) if f.lower().endswith(".json")])
 
+def storage_list_profiles()->list[str]:
+    # the directory mtime moves whenever a profile is created or deleted
+    return _list_profiles(os.stat(PROFILES_DIR).st_mtime_ns)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _load_profile(path: str, mtime_ns: int)->dict:
+    raw = Path(path).read_bytes()
+    if orjson:
+        # profiles written by json.dump can hold bare NaN, which orjson rejects
+        try: return orjson.loads(raw)
+        except orjson.JSONDecodeError: pass
+    return json.loads(raw)
+
 def storage_read_profile(name: str)->Optional[dict]:
     p=os.path.join(PROFILES_DIR, f"{_slug(name)}.json")
-    if os.path.exists(p):
-        return json.loads(open(p,"r",encoding="utf-8").read())
-    return None
-
-def storage_write_profile(name: str, data: dict)->bool:
     try:
-        with open(os.path.join(PROFILES_DIR, f"{_slug(name)}.json"), "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        mtime_ns=os.stat(p).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _load_profile(p, mtime_ns)
+
+def profile_json(data: dict, pretty: bool=False)->bytes:
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if pretty else 0))
+    if pretty:
+        return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(",",":")).encode("utf-8")
+
+def storage_write_profile(name: str, data: dict, pretty: bool=False)->bool:
+    """Write the profile via a temp file + os.replace so a failed write never leaves a truncated profile."""
+    p=os.path.join(PROFILES_DIR, f"{_slug(name)}.json")
+    tmp=None
+    try:
+        # unique temp file per write so concurrent sessions saving the same profile never share one
+        fd, tmp = tempfile.mkstemp(dir=PROFILES_DIR, suffix=".tmp")
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; keep the permissions open() used to give
+        with os.fdopen(fd, "wb") as f:
+            f.write(profile_json(data, pretty))
+        os.replace(tmp, p)
         return True
     except Exception:
+        if tmp:
+            try: os.remove(tmp)
+            except OSError: pass
         return False
 
+def storage_copy_upload(file, dst: str)->str:
+    """Copy an uploaded file to dst in 1 MiB chunks instead of materialising file.read()."""
+    if hasattr(file, "seek"): file.seek(0)
+    fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    if hasattr(os, "posix_fadvise"):  # not on Windows/macOS
+        try: os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError: pass
+    with os.fdopen(fd, "wb", buffering=1<<20) as out:
+        shutil.copyfileobj(file, out, length=1<<20)
+    return dst
+
 def storage_save_logo(name: str, file)->Optional[str]:
     if file is None: return None
     base=_slug(name); ext=os.path.splitext(getattr(file,"name","logo.png"))[1].lower()
     if ext not in (".png",".jpg",".jpeg",".svg"): ext=".png"
     dst=os.path.join(LOGOS_DIR, f"{base}{ext}")
-    open(dst,"wb").write(file.read())
+    storage_copy_upload(file, dst)
+    storage_load_logo_path.clear()
     return dst
 
+@st.cache_data(ttl=60, show_spinner=False)
 def storage_load_logo_path(name: str)->Optional[str]:
     base=_slug(name)
     for ext in (".png",".jpg",".jpeg",".svg"):
@@ -85,6 +161,40 @@ def storage_load_logo_path(name: str)->Optional[str]:
         if os.path.exists(p): return p
     return None
 
+@st.cache_resource(show_spinner=False)
+def http_session():
+    """Process-wide session so repeated webhook posts reuse pooled TCP/TLS connections."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    sess = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=WEBHOOK_WORKERS)
+    sess.mount("https://", adapter); sess.mount("http://", adapter)
+    return sess
+
+def post_webhook(url: str, payload: dict):
+    return http_session().post(url, json=payload, timeout=8)
+
+@st.cache_resource(show_spinner=False)
+def webhook_pool()->ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS, thread_name_prefix="webhook")
+
+def post_webhook_async(url: str, payload: dict)->None:
+    """Fire-and-forget post; the outcome is collected by drain_webhook_errors() on a later rerun."""
+    fut = webhook_pool().submit(post_webhook, url, payload)
+    st.session_state.setdefault("_webhook_pending", []).append((payload.get("event",""), fut))
+
+def drain_webhook_errors()->list[str]:
+    """Pop finished background posts and return a message for each one that failed."""
+    errors, pending = [], []
+    for event, fut in st.session_state.get("_webhook_pending", []):
+        if not fut.done():
+            pending.append((event, fut)); continue
+        exc = fut.exception()
+        if exc is not None: errors.append(f"{event}: {exc}")
+        elif fut.result().status_code>=400: errors.append(f"{event}: HTTP {fut.result().status_code}")
+    st.session_state["_webhook_pending"] = pending
+    return errors
+
 def default_streams()->list[dict]:
     return [
         {"Stream":"New Clients","TargetValue":400000,"Notes":""},
@@ -93,14 +203,24 @@ def default_streams()->list[dict]:
         {"Stream":"Other / Experiments","TargetValue":50000,"Notes":""},
     ]
 
-def months_from_start(start_date_iso: str)->list[str]:
+def default_roles()->list[dict]:
+    return [{**{c:"" for c in ROLE_COLUMNS}, "Function": f, "FTE": 1.0} for f in CORE_FUNCTIONS]
+
+def default_people_costs(persons: list[str])->pd.DataFrame:
+    """Zero-cost rows for the given people, built column-wise with their final dtypes."""
+    n=len(persons)
+    return pd.DataFrame({"Person":persons, "AnnualCost":np.zeros(n), "StartMonth":np.ones(n, dtype=np.int8),
+                         "HasVan":np.zeros(n, dtype=bool), "Comment":[""]*n, "ExtraMonthly":np.zeros(n)})
+
+@functools.lru_cache(maxsize=12)
+def months_from_start(start_date_iso: str)->tuple[str, ...]:
     """Return MONTHS reordered to start at account start month."""
     try:
         m = dt.date.fromisoformat(start_date_iso).month
     except Exception:
         m = 1
     idx = m-1
-    return MONTHS[idx:] + MONTHS[:idx]
+    return tuple(MONTHS[idx:] + MONTHS[:idx])
 
 def default_monthly_plan(goal: float, start_date_iso: str)->list[dict]:
     months = months_from_start(start_date_iso)
@@ -114,88 +234,160 @@ def default_monthly_actuals(start_date_iso: str)->list[dict]:
 def ensure_year(profile: dict, year: int)->dict:
     years = profile.setdefault("years", {})
     ykey = str(year)
-    if ykey not in years:
-        start = profile.get("business",{}).get("start_date", dt.date.today().isoformat())
-        goal = 0.0
-        years[ykey] = {
-            "revenue_goal": goal,
-            "lock_goal": True,
-            "revenue_streams": default_streams(),
-            "people_costs": [],  # Person, AnnualCost, StartMonth(1-12), HasVan, Comment, ExtraMonthly
-            "van_monthly_default": 1200.0,
-            "monthly_plan": default_monthly_plan(goal, start),
-            "monthly_actuals": default_monthly_actuals(start),
-            "accountability": {m: [] for m in MONTHS},  # not rotated; month names for notes
-            "next_session": {},
-            "coaching_assets": {},  # month -> {images:[{path,caption,include}], links:[{url,caption,include}]}
-            "tasks": [],  # {id,title,assignee,due,status,include_in_report,notes,token}
-            "mission_values": {"mission":"","values":[],"principles":[],"trust_model":"Earned","prompts":{}},
-            "data_sources": [],  # [{name,url}]
-            "account_start_date": start,
-            "horizon_goals": {"M1":None,"M3":None,"M6":None,"M12":None},
-        }
+    if ykey in years:
+        return profile
+    start = profile.get("business",{}).get("start_date", dt.date.today().isoformat())
+    goal = 0.0
+    years[ykey] = {
+        "revenue_goal": goal,
+        "lock_goal": True,
+        "revenue_streams": default_streams(),
+        "people_costs": [],  # Person, AnnualCost, StartMonth(1-12), HasVan, Comment, ExtraMonthly
+        "van_monthly_default": 1200.0,
+        "monthly_plan": default_monthly_plan(goal, start),
+        "monthly_actuals": default_monthly_actuals(start),
+        "accountability": {m: [] for m in MONTHS},  # not rotated; month names for notes
+        "next_session": {},
+        "coaching_assets": {},  # month -> {images:[{path,caption,include}], links:[{url,caption,include}]}
+        "tasks": [],  # {id,title,assignee,due,status,include_in_report,notes,token}
+        "mission_values": {"mission":"","values":[],"principles":[],"trust_model":"Earned","prompts":{}},
+        "data_sources": [],  # [{name,url}]
+        "account_start_date": start,
+        "horizon_goals": {"M1":None,"M3":None,"M6":None,"M12":None},
+    }
     return profile
 
+def ensure_journey(profile: dict)->dict:
+    if "journey" not in profile:
+        profile["journey"] = copy.deepcopy(DEFAULT_JOURNEY)
+    return profile["journey"]
+
 def people_monthly_costs(people_costs: list[dict], van_default: float, months_seq: list[str])->dict:
     """Return month->people_cost for 12 months in the displayed order.
        AnnualCost spread evenly; person counted from StartMonth onwards.
        ExtraMonthly always added (van etc) when counted.
     """
-    # map month name to index 1..12 Jan=1
-    name_to_idx = {m:i+1 for i,m in enumerate(MONTHS)}
-    costs = {m:0.0 for m in months_seq}
-    for p in people_costs or []:
-        startm = int(p.get("StartMonth",1) or 1)
-        annual = float(p.get("AnnualCost",0.0) or 0.0)
-        extra  = float(p.get("ExtraMonthly", 0.0) or 0.0)
-        has_van= bool(p.get("HasVan", False))
-        for m in months_seq:
-            mi = name_to_idx[m]
-            # Treat "StartMonth" relative to calendar (Jan=1). We include cost if month index >= startm.
-            if mi >= startm:
-                costs[m] += (annual/12.0) + (extra if extra else (van_default if has_van else 0.0))
-    return costs
+    if not people_costs:
+        return {m:0.0 for m in months_seq}
+    pc = pd.DataFrame(people_costs)
+    def num(col, default):
+        if col not in pc.columns: return np.full(len(pc), default)
+        return pd.to_numeric(pc[col], errors="coerce").fillna(default).to_numpy(dtype=float)
+    start  = num("StartMonth", 1.0)
+    extra  = num("ExtraMonthly", 0.0)
+    has_van= pc["HasVan"].astype("boolean").fillna(False).to_numpy(dtype=bool) if "HasVan" in pc.columns else np.zeros(len(pc), dtype=bool)
+    # ExtraMonthly, when set, replaces the default van cost
+    monthly= num("AnnualCost", 0.0)/12.0 + np.where(extra!=0, extra, np.where(has_van, van_default, 0.0))
+    # Treat "StartMonth" relative to calendar (Jan=1): a person counts in every month at or after it.
+    month_idx = np.array([MONTH_IDX[m]+1 for m in months_seq])
+    counted = month_idx[:,None] >= start[None,:]
+    return dict(zip(months_seq, (counted @ monthly).tolist()))
 
 def infer_cogs_pct(df: pd.DataFrame)->float:
     # infer from actuals with revenue > 0; else default 25%
-    vals = []
-    for _,r in df.iterrows():
-        rev=float(r.get("RevenueActual",0.0) or 0.0); c=float(r.get("CostOfSales",0.0) or 0.0)
-        if rev>0: vals.append(c/rev)
-    if vals:
-        pct = sum(vals)/len(vals)
+    rev = df["RevenueActual"].to_numpy(dtype=float); cos = df["CostOfSales"].to_numpy(dtype=float)
+    has_rev = rev>0
+    if has_rev.any():
+        pct = float((cos[has_rev]/rev[has_rev]).mean())
         return max(0.0, min(0.95, pct))
     return 0.25
 
 def build_dashboard_df(yb: dict)->pd.DataFrame:
     start = yb.get("account_start_date", dt.date.today().isoformat())
     months_seq = months_from_start(start)
-    mp = pd.DataFrame(yb.get("monthly_plan", default_monthly_plan(yb.get("revenue_goal",0.0), start)))
-    ma = pd.DataFrame(yb.get("monthly_actuals", default_monthly_actuals(start)))
-    df = mp.merge(ma, on="Month", how="left").fillna(0.0)
+    def by_month(records: list[dict], cols: list[str])->dict:
+        # align stored rows to the account's month order; a missing month counts as 0
+        f = pd.DataFrame(records, columns=["Month"]+cols).drop_duplicates("Month").set_index("Month").reindex(months_seq)
+        return {c: pd.to_numeric(f[c], errors="coerce").fillna(0.0).to_numpy(dtype=float) for c in cols}
+    plan = by_month(yb.get("monthly_plan", default_monthly_plan(yb.get("revenue_goal",0.0), start)), ["PlannedRevenue"])
+    act  = by_month(yb.get("monthly_actuals", default_monthly_actuals(start)), ["RevenueActual","CostOfSales","OtherOverheads"])
+    rev, cos, oth = act["RevenueActual"], act["CostOfSales"], act["OtherOverheads"]
     # people monthly
     people_m = people_monthly_costs(yb.get("people_costs", []), float(yb.get("van_monthly_default",1200.0)), months_seq)
-    df["PeopleMonthly"] = df["Month"].map(people_m).fillna(0.0)
+    people = np.array([people_m[m] for m in months_seq])
+    df = pd.DataFrame({"Month": list(months_seq), "PlannedRevenue": plan["PlannedRevenue"], "RevenueActual": rev,
+                       "CostOfSales": cos, "OtherOverheads": oth, "PeopleMonthly": people})
     # break-even using inferred COGS%
     cogs_pct = infer_cogs_pct(df)
-    df["BreakEvenRevenue"] = df["PeopleMonthly"] + df["OtherOverheads"]
-    df["BreakEvenRevenue"] = df["BreakEvenRevenue"] / max(1e-6, (1.0 - cogs_pct))
+    df["BreakEvenRevenue"] = (people + oth) / max(1e-6, (1.0 - cogs_pct))
     # operating profit
-    df["OperatingProfit"] = df["RevenueActual"] - df["CostOfSales"] - df["PeopleMonthly"] - df["OtherOverheads"]
-    df["MarginPct"] = df.apply(lambda r: (r["OperatingProfit"]/r["RevenueActual"]*100.0) if r["RevenueActual"]>0 else None, axis=1)
+    profit = rev - cos - people - oth
+    df["OperatingProfit"] = profit
+    df["MarginPct"] = np.divide(profit*100.0, rev, out=np.full_like(rev, np.nan), where=rev>0)
     return df
 
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+DASHBOARD_INPUTS = ("account_start_date","revenue_goal","monthly_plan","monthly_actuals","people_costs","van_monthly_default")
+
+def dashboard_inputs(yb: dict)->dict:
+    """The slice of a year block that build_dashboard_df reads."""
+    return {k: yb[k] for k in DASHBOARD_INPUTS if k in yb}
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_dashboard_df(inputs_hash: str, _inputs: dict)->pd.DataFrame:
+    # keyed on the digest only; the underscore tells Streamlit not to re-hash the inputs themselves
+    return build_dashboard_df(_inputs)
+
+def fig_to_png(fig)->BytesIO:
+    """Render fig as PNG into a rewound buffer (ReportLab reads it directly, no bytes round-trip)."""
+    out=BytesIO(); fig.savefig(out, format="png", bbox_inches="tight", dpi=160); _pyplot().close(fig); out.seek(0); return out
+
 def fig_to_buf(fig)->bytes:
-    out=BytesIO(); fig.savefig(out, format="png", bbox_inches="tight", dpi=160); plt.close(fig); return out.getvalue()
+    return fig_to_png(fig).getvalue()
 
-def build_tracking_pdf(profile: dict, year:int, df_dash: pd.DataFrame, logo_path: Optional[str],
-                       accountability: dict, next_session: dict, assets: dict, tasks: list[dict])->bytes:
-    buf=BytesIO()
-    doc=SimpleDocTemplate(buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=48, bottomMargin=36)
+def revenue_fig(df_dash: pd.DataFrame, figsize: tuple):
+    """Planned vs Actual vs Break-even revenue by month."""
+    plt=_pyplot()
+    fig, ax = plt.subplots(figsize=figsize)
+    x=list(range(len(df_dash)))
+    ax.plot(x, df_dash["PlannedRevenue"], marker="")
+    ax.plot(x, df_dash["RevenueActual"], marker="")
+    ax.plot(x, df_dash["BreakEvenRevenue"], marker="")
+    ax.set_xticks(x); ax.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
+    ax.set_ylabel("Revenue ($)"); ax.legend(["Planned","Actual","Break‑even"])
+    return fig
+
+def profit_fig(df_dash: pd.DataFrame, figsize: tuple):
+    """Operating profit bars with margin % on a twin axis."""
+    plt=_pyplot()
+    fig, ax1 = plt.subplots(figsize=figsize)
+    x=list(range(len(df_dash)))
+    ax1.bar(x, df_dash["OperatingProfit"].fillna(0.0))
+    ax1.set_xticks(x); ax1.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
+    ax1.set_ylabel("Operating Profit ($)")
+    ax2=ax1.twinx(); ax2.plot(x, df_dash["MarginPct"].to_numpy(dtype=float), marker="o")
+    ax2.set_ylabel("Margin %")
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def dashboard_chart_png(kind: str, inputs_hash: str, _df_dash: pd.DataFrame)->bytes:
+    """PNG for the dashboard 'revenue' or 'profit' chart; inputs_hash identifies _df_dash."""
+    fig = revenue_fig(_df_dash, (8,3)) if kind=="revenue" else profit_fig(_df_dash, (8,3))
+    return fig_to_buf(fig)
+
+@st.cache_resource(show_spinner=False)
+def pdf_styles():
+    """Sample stylesheet plus the report headings; built once per process and shared by every PDF."""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     styles=getSampleStyleSheet()
     styles.add(ParagraphStyle(name="H1", fontName="Helvetica-Bold", fontSize=18, spaceAfter=12))
     styles.add(ParagraphStyle(name="H2", fontName="Helvetica-Bold", fontSize=13, spaceAfter=8))
     styles.add(ParagraphStyle(name="Body", fontName="Helvetica", fontSize=10, leading=13))
+    return styles
+
+def build_tracking_pdf(profile: dict, year:int, df_dash: pd.DataFrame, logo_path: Optional[str],
+                       accountability: dict, next_session: dict, assets: dict, tasks: list[dict])->bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage, PageBreak
+    buf=BytesIO()
+    doc=SimpleDocTemplate(buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=48, bottomMargin=36)
+    styles=pdf_styles()
     elems=[]
     title=f"{profile['business'].get('name','Business')} — Tracking Report {year}"
     elems.append(Paragraph(title, styles["H1"]))
@@ -217,22 +409,8 @@ def build_tracking_pdf(profile: dict, year:int, df_dash: pd.DataFrame, logo_path
     elems.append(t); elems.append(Spacer(1,8))
 
     # Charts
-    fig1, ax = plt.subplots(figsize=(7.2,3))
-    x=list(range(len(df_dash)))
-    ax.plot(x, df_dash["PlannedRevenue"], marker="")
-    ax.plot(x, df_dash["RevenueActual"], marker="")
-    ax.plot(x, df_dash["BreakEvenRevenue"], marker="")
-    ax.set_xticks(x); ax.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
-    ax.set_ylabel("Revenue ($)"); ax.legend(["Planned","Actual","Break‑even"])
-    elems.append(RLImage(BytesIO(fig_to_buf(fig1)), width=500, height=200)); elems.append(Spacer(1,6))
-
-    fig2, ax1 = plt.subplots(figsize=(7.2,3))
-    ax1.bar(x, df_dash["OperatingProfit"].fillna(0.0))
-    ax1.set_xticks(x); ax1.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
-    ax1.set_ylabel("Operating Profit ($)")
-    ax2=ax1.twinx(); ax2.plot(x, [m if m is not None else float('nan') for m in df_dash["MarginPct"]], marker="o")
-    ax2.set_ylabel("Margin %")
-    elems.append(RLImage(BytesIO(fig_to_buf(fig2)), width=500, height=200))
+    elems.append(RLImage(fig_to_png(revenue_fig(df_dash, (7.2,3))), width=500, height=200)); elems.append(Spacer(1,6))
+    elems.append(RLImage(fig_to_png(profit_fig(df_dash, (7.2,3))), width=500, height=200))
 
     # Assets included
     elems.append(PageBreak())
@@ -284,12 +462,12 @@ def build_tracking_pdf(profile: dict, year:int, df_dash: pd.DataFrame, logo_path
     doc.build(elems); return buf.getvalue()
 
 def build_details_pdf(profile: dict, year:int, include_flags: dict, logo_path: Optional[str])->bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
     buf=BytesIO()
     doc=SimpleDocTemplate(buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=48, bottomMargin=36)
-    styles=getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="H1", fontName="Helvetica-Bold", fontSize=18, spaceAfter=12))
-    styles.add(ParagraphStyle(name="H2", fontName="Helvetica-Bold", fontSize=13, spaceAfter=8))
-    styles.add(ParagraphStyle(name="Body", fontName="Helvetica", fontSize=10, leading=13))
+    styles=pdf_styles()
     elems=[]
     title=f"{profile['business'].get('name','Business')} — Details {year}"
     elems.append(Paragraph(title, styles["H1"]))
@@ -316,7 +494,7 @@ def build_details_pdf(profile: dict, year:int, include_flags: dict, logo_path: O
         roles=pd.DataFrame(profile.get("roles", []))
         if not roles.empty:
             cols=["Function","Role","Person","FTE","ReportsTo","KPIs"]
-            roles=roles[cols].fillna("")
+            roles=roles.reindex(columns=cols).fillna("")
             data=[cols]+roles.values.tolist()
             t=Table(data, hAlign="LEFT", colWidths=[110,120,100,40,100,120])
             t.setStyle(TableStyle([("FONT",(0,0),(-1,-1),"Helvetica",9),("BACKGROUND",(0,0),(-1,0), colors.whitesmoke),("GRID",(0,0),(-1,-1),0.25, colors.lightgrey)]))
@@ -360,7 +538,7 @@ if "business_name" not in st.session_state: st.session_state.business_name = "My
 if "profile" not in st.session_state:
     st.session_state.profile = {"business":{"name": st.session_state.business_name, "start_date": dt.date.today().isoformat()},
                                 "functions": CORE_FUNCTIONS.copy(),
-                                "roles": [{"Function": f,"Role":"","Person":"","FTE":1.0,"ReportsTo":"","KPIs":"","Accountabilities":"","Notes":""} for f in CORE_FUNCTIONS],
+                                "roles": default_roles(),
                                 "years": {},
                                 "integrations": {}}
 if "current_logo_path" not in st.session_state: st.session_state.current_logo_path = storage_load_logo_path(st.session_state.business_name)
@@ -416,6 +594,9 @@ with st.sidebar:
                 ok = storage_write_profile(nm, st.session_state.profile)
                 if ok: st.session_state.business_name = nm; st.success(f"Saved as {nm}"); st.rerun()
                 else: st.error("Save As failed.")
+        if st.button("Export JSON"):
+            st.download_button("Save profile.json", data=profile_json(st.session_state.profile, pretty=True),
+                               file_name=f"{_slug(st.session_state.business_name)}.json", mime="application/json")
         with st.popover("Delete selected business"):
             st.caption("This permanently deletes the selected profile and its logo(s).")
             confirm = st.checkbox("I understand", key="chk_del")
@@ -429,6 +610,8 @@ with st.sidebar:
                         p=os.path.join(LOGOS_DIR, f"{_slug(sel)}{ext}")
                         try: os.remove(p)
                         except FileNotFoundError: pass
+                    storage_load_logo_path.clear()
+                    st.session_state.pop("_saved_hash", None)
                     st.success(f"Deleted: {sel}"); st.rerun()
 
     with st.expander("Integrations (Push Sync)", expanded=False):
@@ -452,11 +635,11 @@ with st.sidebar:
                 st.success("Saved integration settings.")
         with c2:
             if st.button("Send Test Webhook"):
-                if not requests or not upcoach_url.strip():
+                if not HAS_REQUESTS or not upcoach_url.strip():
                     st.warning("Need requests and UpCoach URL")
                 else:
                     try:
-                        r = requests.post(upcoach_url, json={"event":"test","business":st.session_state.business_name,"ts":dt.datetime.utcnow().isoformat()}, timeout=8)
+                        r = post_webhook(upcoach_url, {"event":"test","business":st.session_state.business_name,"ts":dt.datetime.utcnow().isoformat()})
                         st.success(f"Webhook status {r.status_code}")
                     except Exception as e:
                         st.error(f"Webhook failed: {e}")
@@ -493,6 +676,9 @@ profile = st.session_state.profile
 ensure_year(profile, st.session_state.selected_year)
 yk = str(st.session_state.selected_year)
 yb = profile["years"][yk]
+# account start date, parsed once per rerun; falls back to the business start date, then today
+try: acct_start = dt.date.fromisoformat(yb.get("account_start_date") or profile["business"].get("start_date") or "")
+except (TypeError, ValueError): acct_start = dt.date.today()
 
 # One-click task completion via URL token
 if complete_token:
@@ -501,9 +687,8 @@ if complete_token:
             t["status"]="Done"
             st.success(f"Task '{t.get('title','')}' marked complete via link.")
             integ = profile.get("integrations", {})
-            if integ.get("upcoach_url") and requests:
-                try: requests.post(integ["upcoach_url"], json={"event":"task.completed","business":profile['business']['name'],"task":t}, timeout=8)
-                except Exception: pass
+            if integ.get("upcoach_url") and HAS_REQUESTS:
+                post_webhook_async(integ["upcoach_url"], {"event":"task.completed","business":profile['business']['name'],"task":dict(t)})
             break
 
 # --- Organisation: Functions & Roles ---
@@ -530,7 +715,8 @@ with st.expander("Organisation: Functions & Roles", expanded=False):
             "KPIs": st.column_config.TextColumn(help="Comma-separated"),
             "Accountabilities": st.column_config.TextColumn(help="Bullets or lines"),
         })
-    profile["roles"]=edited.fillna("").to_dict(orient="records")
+    if not edited.equals(df):
+        profile["roles"]=edited.fillna("").to_dict(orient="records")
 
 # --- Revenue Streams ---
 with st.expander("Revenue Streams (this year)", expanded=False):
@@ -539,9 +725,11 @@ with st.expander("Revenue Streams (this year)", expanded=False):
     edited = st.data_editor(rev, num_rows="dynamic", use_container_width=True, hide_index=True,
                             column_config={
                                 "Stream": st.column_config.TextColumn(),
-                                "TargetValue": st.column_config.NumberColumn(format="%.0f"),
+                                "TargetValue": st.column_config.NumberColumn(format="%.0f", min_value=0.0),
                                 "Notes": st.column_config.TextColumn(),
                             })
+    # rows added in the editor come back with NaN targets; cast once so records and total agree
+    edited["TargetValue"]=pd.to_numeric(edited["TargetValue"], errors="coerce").fillna(0.0)
     yb["revenue_streams"]=edited.fillna("").to_dict(orient="records")
     streams_total = float(edited["TargetValue"].sum())
     lock_goal = bool(yb.get("lock_goal", True))
@@ -556,15 +744,20 @@ with st.expander("People Costs (Annual) & Vans", expanded=False):
     st.number_input("Default van monthly cost ($)", min_value=0.0, value=float(yb.get("van_monthly_default",1200.0)), step=50.0, key="van_default")
     yb["van_monthly_default"]=float(st.session_state.van_default)
     # ensure people list from roles people
-    role_people = sorted({(r.get("Person") or "").strip() for r in profile.get("roles", []) if (r.get("Person") or "").strip()})
+    role_people = sorted({p for p in ((r.get("Person") or "").strip() for r in profile.get("roles", [])) if p})
     pc = pd.DataFrame(yb.get("people_costs", []))
-    if pc.empty and role_people:
-        pc = pd.DataFrame([{"Person":p,"AnnualCost":0.0,"StartMonth":1,"HasVan":False,"Comment":"","ExtraMonthly":0.0} for p in role_people])
+    known = set(pc["Person"]) if "Person" in pc.columns else set()
+    missing = [p for p in role_people if p not in known]
+    if missing:
+        new_rows = default_people_costs(missing)
+        pc = new_rows if pc.empty else pd.concat([pc, new_rows], ignore_index=True)
     colmap = ["Person","AnnualCost","StartMonth","HasVan","Comment","ExtraMonthly"]
     for c in colmap:
         if c not in pc.columns: pc[c]=0 if c!="Person" and c!="Comment" and c!="HasVan" else ("" if c in ("Person","Comment") else False)
     pc["AnnualCost"]=pd.to_numeric(pc["AnnualCost"], errors="coerce").fillna(0.0)
-    pc["StartMonth"]=pd.to_numeric(pc["StartMonth"], errors="coerce").fillna(1).clip(1,12).astype(int)
+    # narrow dtypes keep the Arrow payload sent to the editor small; money stays float64 so cents round-trip exactly
+    pc["StartMonth"]=pd.to_numeric(pc["StartMonth"], errors="coerce").fillna(1).clip(1,12).astype("int8")
+    pc["HasVan"]=pc["HasVan"].astype("boolean").fillna(False).astype(bool)
     pc["ExtraMonthly"]=pd.to_numeric(pc["ExtraMonthly"], errors="coerce").fillna(0.0)
     edited = st.data_editor(pc[colmap], num_rows="dynamic", use_container_width=True, hide_index=True,
                             column_config={
@@ -579,8 +772,9 @@ with st.expander("People Costs (Annual) & Vans", expanded=False):
 
 # --- Setup: Account start date & Horizon goals & Data sources ---
 with st.expander("Setup — Timing & Goals & Data sources (per company)", expanded=False):
-    st.date_input("Account Start Date", value=dt.date.fromisoformat(yb.get("account_start_date", profile["business"].get("start_date", dt.date.today().isoformat()))), key="acc_start_date")
-    yb["account_start_date"]=st.session_state.acc_start_date.isoformat()
+    st.date_input("Account Start Date", value=acct_start, key="acc_start_date")
+    acct_start = st.session_state.acc_start_date
+    yb["account_start_date"]=acct_start.isoformat()
     c1,c2,c3,c4 = st.columns(4)
     yb["horizon_goals"]["M1"] = c1.number_input("1‑month goal ($)", min_value=0.0, value=float(yb["horizon_goals"].get("M1") or 0.0), step=1000.0)
     yb["horizon_goals"]["M3"] = c2.number_input("3‑month goal ($)", min_value=0.0, value=float(yb["horizon_goals"].get("M3") or 0.0), step=1000.0)
@@ -597,22 +791,23 @@ with st.expander("Setup — Timing & Goals & Data sources (per company)", expand
 
 # --- Tracking Quick Entry ---
 with st.expander("Tracking — Quick Entry", expanded=False):
-    months_seq = months_from_start(yb.get("account_start_date", profile["business"].get("start_date", dt.date.today().isoformat())))
+    months_seq = months_from_start(acct_start.isoformat())
     month = st.selectbox("Month", options=months_seq, index=0)
     rev = st.number_input("Revenue (this month)", min_value=0.0, value=0.0, step=100.0)
     cos = st.number_input("Cost of Sales (materials etc)", min_value=0.0, value=0.0, step=100.0)
     oth = st.number_input("Other Overheads (rent, admin, etc)", min_value=0.0, value=0.0, step=100.0)
     if st.button("Save Month Entry"):
-        ma = pd.DataFrame(yb.get("monthly_actuals", default_monthly_actuals(yb.get("account_start_date", profile["business"].get("start_date", dt.date.today().isoformat())))))
-        if month in list(ma["Month"]):
-            idx = list(ma["Month"]).index(month)
+        ma = pd.DataFrame(yb.get("monthly_actuals", default_monthly_actuals(acct_start.isoformat())))
+        hit = ma.index[ma["Month"]==month]
+        if len(hit):
+            idx = hit[0]
             ma.loc[idx,"RevenueActual"]=rev; ma.loc[idx,"CostOfSales"]=cos; ma.loc[idx,"OtherOverheads"]=oth
             yb["monthly_actuals"]=ma.to_dict(orient="records")
             st.success(f"Saved {month}.")
 
 # --- Coaching Notes & Assets ---
 with st.expander("Coaching — Notes, Screenshots & URLs", expanded=False):
-    ns = yb.get("coaching_assets", {})
+    ns = yb.setdefault("coaching_assets", {})
     msel = st.selectbox("Month", options=MONTHS, index=0)
     notes = st.text_area("Notes (context for the month)", value=(ns.get(msel,{}).get("notes","")))
     # URLs
@@ -629,10 +824,11 @@ with st.expander("Coaching — Notes, Screenshots & URLs", expanded=False):
     imgs = st.file_uploader("Upload screenshot(s)", type=["png","jpg","jpeg"], accept_multiple_files=True)
     if st.button("Upload screenshot(s)") and imgs:
         pack = ns.get(msel, {"images":[], "links":[], "notes":""})
-        for f in imgs:
+        names = _random_hex_tokens(len(imgs))
+        for f, name in zip(imgs, names):
             ext=os.path.splitext(f.name)[1].lower() or ".png"
-            dst=os.path.join(ASSETS_DIR, f"{uuid.uuid4().hex}{ext}")
-            open(dst,"wb").write(f.read())
+            dst=os.path.join(ASSETS_DIR, f"{name}{ext}")
+            storage_copy_upload(f, dst)
             pack["images"].append({"path":dst,"caption":f.name,"include":True})
         ns[msel]=pack
     # Included list
@@ -643,24 +839,28 @@ with st.expander("Coaching — Notes, Screenshots & URLs", expanded=False):
         ln["include"] = st.checkbox(f"URL: {ln.get('url','')} — {ln.get('caption','')}", value=bool(ln.get("include",True)), key=f"incl_url_{msel}_{i}")
     for i,im in enumerate(pack.get("images", [])):
         im["include"] = st.checkbox(f"Image: {im.get('caption','screenshot')}", value=bool(im.get("include",True)), key=f"incl_img_{msel}_{i}")
-    pack["notes"]=notes
-    ns[msel]=pack
-    yb["coaching_assets"]=ns
+    # only store the month's pack when something was entered; browsing months must not add empty entries
+    if notes != pack.get("notes",""):
+        pack["notes"]=notes
+    if msel not in ns and (pack["notes"] or pack["links"] or pack["images"]):
+        ns[msel]=pack
 
 # --- Accountability Items & Next Session ---
 with st.expander("Accountability & Next Coaching Session", expanded=False):
-    msel = st.selectbox("Month", options=MONTHS, index=0, key="acct_month")
-    cur = yb.get("accountability", {}).get(msel, [])
     st.write("Add accountability item")
-    col1,col2,col3,col4 = st.columns([3,1,1,1])
-    with col1: action = st.text_input("Action", key="act_action")
-    with col2: owner  = st.text_input("Owner", key="act_owner")
-    with col3: due    = st.text_input("Due (date)", key="act_due")
-    with col4: status = st.selectbox("Status", ["Planned","In progress","Done"], index=0, key="act_status")
-    notes = st.text_input("Notes", key="act_notes")
-    if st.button("Add Item"):
-        cur.append({"action":action,"owner":owner,"due":due,"status":status,"notes":notes})
-        yb["accountability"][msel]=cur
+    # month stays outside the form so clearing the fields after Add Item keeps the chosen month
+    msel = st.selectbox("Month", options=MONTHS, index=0, key="acct_month")
+    # one form so typing in the fields doesn't rerun the page until Add Item is pressed
+    with st.form("acct_add_form", clear_on_submit=True):
+        col1,col2,col3,col4 = st.columns([3,1,1,1])
+        with col1: action = st.text_input("Action", key="act_action")
+        with col2: owner  = st.text_input("Owner", key="act_owner")
+        with col3: due    = st.text_input("Due (date)", key="act_due")
+        with col4: status = st.selectbox("Status", STATUS_OPTIONS, index=0, key="act_status")
+        notes = st.text_input("Notes", key="act_notes")
+        add_item = st.form_submit_button("Add Item")
+    if add_item:
+        yb.setdefault("accountability", {}).setdefault(msel, []).append({"action":action,"owner":owner,"due":due,"status":status,"notes":notes})
         st.success("Added.")
 
     st.markdown("---")
@@ -672,72 +872,113 @@ with st.expander("Accountability & Next Coaching Session", expanded=False):
 
 # --- Tasks with completion links ---
 with st.expander("Tasks & Invitations", expanded=False):
+    for err in drain_webhook_errors():
+        st.warning(f"Webhook failed — {err}")
     tasks = yb.get("tasks", [])
-    c1,c2,c3,c4 = st.columns([2,1,1,1])
-    with c1: t_title = st.text_input("Task title", key="tsk_t")
-    with c2: t_assn  = st.text_input("Assignee (email/name)", key="tsk_a")
-    with c3: t_due   = st.text_input("Due (date)", key="tsk_d")
-    with c4: t_incl  = st.checkbox("Include in report", value=True, key="tsk_i")
-    t_notes = st.text_input("Notes", key="tsk_n")
-    if st.button("Create Task"):
-        tok = uuid.uuid4().hex
-        tasks.append({"id":uuid.uuid4().hex,"title":t_title,"assignee":t_assn,"due":t_due,"status":"Planned","include_in_report":t_incl,"notes":t_notes,"token":tok})
+    with st.form("task_create_form", clear_on_submit=True):
+        c1,c2,c3,c4 = st.columns([2,1,1,1])
+        with c1: t_title = st.text_input("Task title", key="tsk_t")
+        with c2: t_assn  = st.text_input("Assignee (email/name)", key="tsk_a")
+        with c3: t_due   = st.text_input("Due (date)", key="tsk_d")
+        with c4: t_incl  = st.checkbox("Include in report", value=True, key="tsk_i")
+        t_notes = st.text_input("Notes", key="tsk_n")
+        create_task = st.form_submit_button("Create Task")
+    if create_task:
+        tid, tok = _random_hex_tokens(2)
+        tasks.append({"id":tid,"title":t_title,"assignee":t_assn,"due":t_due,"status":"Planned","include_in_report":t_incl,"notes":t_notes,"token":tok})
         yb["tasks"]=tasks
         # webhook: task.created
         integ = profile.get("integrations", {})
-        if integ.get("upcoach_url") and requests:
-            try: requests.post(integ["upcoach_url"], json={"event":"task.created","business":profile['business']['name'],"task":tasks[-1]}, timeout=8)
-            except Exception: pass
+        if integ.get("upcoach_url") and HAS_REQUESTS:
+            post_webhook_async(integ["upcoach_url"], {"event":"task.created","business":profile['business']['name'],"task":dict(tasks[-1])})
         st.success("Task created.")
     st.markdown("**Current tasks**")
+    # one editor for the whole list; rows are matched back to stored tasks by id so tokens survive edits
+    tasks_df = pd.DataFrame(tasks, columns=TASK_COLUMNS)
+    tasks_df["include_in_report"]=tasks_df["include_in_report"].astype("boolean").fillna(True).astype(bool)
+    edited = st.data_editor(tasks_df, num_rows="dynamic", use_container_width=True, hide_index=True,
+                            column_config={
+                                "status": st.column_config.SelectboxColumn(options=list(STATUS_OPTIONS), default="Planned", required=True),
+                                "include_in_report": st.column_config.CheckboxColumn(default=True),
+                                "id": st.column_config.TextColumn(disabled=True),
+                            })
+    if not edited.equals(tasks_df):
+        blank = {"title":"","assignee":"","due":"","status":"Planned","include_in_report":True,"notes":"","id":""}
+        rows = [{k: (blank[k] if pd.isna(v) else v) for k,v in r.items()} for r in edited.to_dict(orient="records")]
+        by_id = {t.get("id"): t for t in tasks}
+        fresh = iter(_random_hex_tokens(2*sum(1 for r in rows if r["id"] not in by_id)))
+        integ = profile.get("integrations", {})
+        kept = []
+        for r in rows:
+            old = by_id.get(r["id"])
+            if old is None:
+                r["id"], r["token"] = next(fresh), next(fresh)
+                if integ.get("upcoach_url") and HAS_REQUESTS:
+                    post_webhook_async(integ["upcoach_url"], {"event":"task.created","business":profile['business']['name'],"task":dict(r)})
+            else:
+                r = {**old, **r}
+                if r["status"]=="Done" and old.get("status")!="Done" and integ.get("upcoach_url") and HAS_REQUESTS:
+                    post_webhook_async(integ["upcoach_url"], {"event":"task.completed","business":profile['business']['name'],"task":dict(r)})
+            kept.append(r)
+        yb["tasks"]=tasks=kept
     app_base = profile.get("integrations",{}).get("app_base_url","")
-    for t in tasks:
-        link = f"{app_base}?complete_task={t.get('token')}" if app_base else "(set App Base URL to generate link)"
-        st.write(f"- **{t['title']}** — {t['assignee']} — due {t['due']} — status: {t['status']} — Complete link: {link}")
+    if tasks:
+        st.caption("Completion links")
+        lines = []
+        for t in tasks:
+            link = f"{app_base}?complete_task={t.get('token')}" if app_base else "(set App Base URL to generate link)"
+            lines.append(f"- **{t['title']}** — {link}")
+        st.markdown("\n".join(lines))
 
 # --- PUSH SYNC ---
-with st.expander("PUSH SYNC", expanded=False):
-    st.caption("Select destinations and push summary payload.")
-    dest = st.multiselect("Destinations", ["UPCOACH","CALENDARLY","EMAIL","OTHER"])
-    email_to = st.text_input("Email To (comma‑sep, if EMAIL chosen)")
-    if st.button("Push now"):
-        payload = {
-            "event":"push.sync",
-            "business": profile["business"]["name"],
-            "year": int(yk),
-            "summary": {
-                "streams_total": sum(float(x.get("TargetValue",0.0) or 0.0) for x in yb.get("revenue_streams", [])),
-                "next_session": yb.get("next_session",{}),
-                "tasks": yb.get("tasks",[]),
-            },
-            "ts": dt.datetime.utcnow().isoformat()
-        }
-        integ = profile.get("integrations", {})
-        log_msgs = []
-        if "UPCOACH" in dest and integ.get("upcoach_url") and requests:
-            try:
-                r=requests.post(integ["upcoach_url"], json=payload, timeout=8)
-                log_msgs.append(f"UpCoach {r.status_code}")
-            except Exception as e:
-                log_msgs.append(f"UpCoach failed: {e}")
-        if "CALENDARLY" in dest and integ.get("calendly_url"):
-            log_msgs.append(f"Calendly: {integ['calendly_url']} (share this link)")
-        if "EMAIL" in dest and smtplib and integ.get("smtp_host") and integ.get("smtp_from") and integ.get("smtp_user") and integ.get("smtp_pass"):
-            try:
-                msg=MIMEMultipart("alternative")
-                msg["Subject"]=f"Tracking Success — {profile['business']['name']} — Sync"
-                msg["From"]=integ["smtp_from"]; tos=[e.strip() for e in email_to.split(",") if e.strip()]
-                msg["To"]=",".join(tos or [integ["smtp_from"]])
-                html=f"<p>Sync payload:</p><pre>{json.dumps(payload, indent=2)}</pre>"
-                msg.attach(MIMEText(html,"html"))
-                with smtplib.SMTP(integ["smtp_host"], int(integ["smtp_port"])) as s:
-                    s.starttls(); s.login(integ["smtp_user"], integ["smtp_pass"]); s.sendmail(integ["smtp_from"], tos or [integ["smtp_from"]], msg.as_string())
-                log_msgs.append("Email sent")
-            except Exception as e:
-                log_msgs.append(f"Email failed: {e}")
-        if "OTHER" in dest:
-            log_msgs.append("Other: (no‑op stub)")
-        st.success(" ; ".join(log_msgs) if log_msgs else "Nothing to push: configure integrations.")
+# Fragments rerun on their own; only sections that don't edit the profile are fragments,
+# since a fragment rerun skips the autosave at the end of the script.
+@st.fragment
+def push_sync_section(profile: dict, yb: dict, yk: str):
+    with st.expander("PUSH SYNC", expanded=False):
+        st.caption("Select destinations and push summary payload.")
+        dest = st.multiselect("Destinations", ["UPCOACH","CALENDARLY","EMAIL","OTHER"])
+        email_to = st.text_input("Email To (comma‑sep, if EMAIL chosen)")
+        if st.button("Push now"):
+            payload = {
+                "event":"push.sync",
+                "business": profile["business"]["name"],
+                "year": int(yk),
+                "summary": {
+                    "streams_total": sum(float(x.get("TargetValue",0.0) or 0.0) for x in yb.get("revenue_streams", [])),
+                    "next_session": yb.get("next_session",{}),
+                    "tasks": yb.get("tasks",[]),
+                },
+                "ts": dt.datetime.utcnow().isoformat()
+            }
+            integ = profile.get("integrations", {})
+            log_msgs = []
+            if "UPCOACH" in dest and integ.get("upcoach_url") and HAS_REQUESTS:
+                try:
+                    r=post_webhook(integ["upcoach_url"], payload)
+                    log_msgs.append(f"UpCoach {r.status_code}")
+                except Exception as e:
+                    log_msgs.append(f"UpCoach failed: {e}")
+            if "CALENDARLY" in dest and integ.get("calendly_url"):
+                log_msgs.append(f"Calendly: {integ['calendly_url']} (share this link)")
+            if "EMAIL" in dest and smtplib and integ.get("smtp_host") and integ.get("smtp_from") and integ.get("smtp_user") and integ.get("smtp_pass"):
+                try:
+                    msg=MIMEMultipart("alternative")
+                    msg["Subject"]=f"Tracking Success — {profile['business']['name']} — Sync"
+                    msg["From"]=integ["smtp_from"]; tos=[e.strip() for e in email_to.split(",") if e.strip()]
+                    msg["To"]=",".join(tos or [integ["smtp_from"]])
+                    html=f"<p>Sync payload:</p><pre>{json.dumps(payload, indent=2)}</pre>"
+                    msg.attach(MIMEText(html,"html"))
+                    with smtplib.SMTP(integ["smtp_host"], int(integ["smtp_port"])) as s:
+                        s.starttls(); s.login(integ["smtp_user"], integ["smtp_pass"]); s.sendmail(integ["smtp_from"], tos or [integ["smtp_from"]], msg.as_string())
+                    log_msgs.append("Email sent")
+                except Exception as e:
+                    log_msgs.append(f"Email failed: {e}")
+            if "OTHER" in dest:
+                log_msgs.append("Other: (no‑op stub)")
+            st.success(" ; ".join(log_msgs) if log_msgs else "Nothing to push: configure integrations.")
+
+push_sync_section(profile, yb, yk)
 
 # --- Mission & Values ---
 with st.expander("Mission & Values (foundations)", expanded=False):
@@ -762,11 +1003,10 @@ with st.expander("Mission & Values (foundations)", expanded=False):
 
 # --- Customer Journey Mapping (beta) ---
 with st.expander("Customer Journey Mapping (beta)", expanded=False):
-    def_j_cols = ["Actions","Touchpoints","Emotions","PainPoints","Solutions"]
-    journey = profile.get("journey", {"stages":["Awareness","Consideration","Purchase","Service","Loyalty"], "columns":def_j_cols, "data":{}})
-    stages = journey.get("stages",[])
-    cols   = journey.get("columns",def_j_cols)
-    data   = journey.get("data", {s:[{c:""} for c in cols] for s in stages} if stages else {})
+    journey = ensure_journey(profile)
+    stages = journey.setdefault("stages", [])
+    cols   = journey.setdefault("columns", list(DEFAULT_JOURNEY["columns"]))
+    data   = journey.setdefault("data", {})
     cA,cB = st.columns([3,1])
     with cA: new_stage=st.text_input("Add stage")
     with cB:
@@ -777,47 +1017,39 @@ with st.expander("Customer Journey Mapping (beta)", expanded=False):
     if st.button("🗑️ Delete") and del_sel!="(none)":
         stages.remove(del_sel); data.pop(del_sel,None)
     st.markdown("---")
+    # one long-format editor (Stage column) instead of one widget per stage
+    long_df = pd.DataFrame([{"Stage": s, **row} for s in stages for row in data.get(s, [])], columns=["Stage"]+cols)
+    edited = st.data_editor(long_df, num_rows="dynamic", use_container_width=True, hide_index=True,
+                            column_config={"Stage": st.column_config.SelectboxColumn(options=stages, required=True)})
+    by_stage = {s: g[cols].to_dict(orient="records") for s, g in edited.fillna("").groupby("Stage", sort=False)}
     for s in stages:
-        st.subheader(s)
-        df = pd.DataFrame(data.get(s, []), columns=cols)
-        edited = st.data_editor(df, num_rows="dynamic", use_container_width=True, hide_index=True)
-        data[s]=edited.fillna("").to_dict(orient="records")
-    journey["stages"]=stages; journey["columns"]=cols; journey["data"]=data
-    profile["journey"]=journey
+        data[s]=by_stage.get(s, [])
 
 # --- Dashboard & Reports ---
 st.header("Dashboard & Reports")
-df_dash = build_dashboard_df(yb)
+# Derived artifacts are reused until their inputs change: the frame and charts only
+# follow the financial fields, the PDFs the whole year block (hashed only when a PDF is asked for)
+dash_in = dashboard_inputs(yb)
+dash_hash = _content_hash(dash_in)
+df_dash = cached_dashboard_df(dash_hash, dash_in)
 c1,c2,c3 = st.columns(3)
 with c1: st.metric("Revenue goal (12‑mo)", f"${float(yb.get('revenue_goal',0.0)):,.0f}")
 with c2: st.metric("YTD Revenue", f"${float(df_dash['RevenueActual'].sum()):,.0f}")
 with c3: st.metric("YTD Operating Profit", f"${float(df_dash['OperatingProfit'].sum()):,.0f}")
 
 # Charts
-fig1, ax = plt.subplots(figsize=(8,3))
-x=list(range(len(df_dash)))
-ax.plot(x, df_dash["PlannedRevenue"], marker="")
-ax.plot(x, df_dash["RevenueActual"], marker="")
-ax.plot(x, df_dash["BreakEvenRevenue"], marker="")
-ax.set_xticks(x); ax.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
-ax.set_ylabel("Revenue ($)"); ax.legend(["Planned","Actual","Break‑even"])
-st.pyplot(fig1)
-
-fig2, ax1 = plt.subplots(figsize=(8,3))
-ax1.bar(x, df_dash["OperatingProfit"].fillna(0.0))
-ax1.set_xticks(x); ax1.set_xticklabels(df_dash["Month"], rotation=45, ha="right")
-ax1.set_ylabel("Operating Profit ($)")
-ax2=ax1.twinx(); ax2.plot(x, [m if m is not None else float('nan') for m in df_dash["MarginPct"]], marker="o")
-ax2.set_ylabel("Margin %")
-st.pyplot(fig2)
+st.image(dashboard_chart_png("revenue", dash_hash, df_dash), use_column_width=True)
+st.image(dashboard_chart_png("profit", dash_hash, df_dash), use_column_width=True)
 
 # Report buttons
 colA,colB = st.columns(2)
 with colA:
     if st.button("Download Tracking PDF"):
-        pdf_bytes = build_tracking_pdf(profile, int(yk), df_dash, st.session_state.current_logo_path,
-                                       yb.get("accountability",{}), yb.get("next_session",{}),
-                                       yb.get("coaching_assets",{}), yb.get("tasks",[]))
+        logo_path = st.session_state.current_logo_path
+        pdf_bytes = _memo_by_hash("_tracking_pdf", _content_hash([yb, profile["business"], logo_path]),
+                                  lambda: build_tracking_pdf(profile, int(yk), df_dash, logo_path,
+                                                             yb.get("accountability",{}), yb.get("next_session",{}),
+                                                             yb.get("coaching_assets",{}), yb.get("tasks",[])))
         st.download_button("Save Tracking.pdf", data=pdf_bytes, file_name=f"Tracking_{profile['business']['name']}_{yk}.pdf", mime="application/pdf")
 with colB:
     st.write("Details PDF — include sections:")
@@ -826,71 +1058,82 @@ with colB:
     inc_people  = st.checkbox("People Costs", value=True)
     inc_monthly = st.checkbox("Monthly Plan & Actuals", value=True)
     if st.button("Download Details PDF"):
-        pdf2=build_details_pdf(profile, int(yk), {"streams":inc_streams,"roles":inc_roles,"people":inc_people,"monthly":inc_monthly}, st.session_state.current_logo_path)
+        flags={"streams":inc_streams,"roles":inc_roles,"people":inc_people,"monthly":inc_monthly}
+        logo_path = st.session_state.current_logo_path
+        pdf2=_memo_by_hash("_details_pdf", _content_hash([yb, profile["business"], profile.get("roles", []), flags, logo_path]),
+                           lambda: build_details_pdf(profile, int(yk), flags, logo_path))
         st.download_button("Save Details.pdf", data=pdf2, file_name=f"Details_{profile['business']['name']}_{yk}.pdf", mime="application/pdf")
 
 # --- Trade Profit Calculator ---
-with st.expander("Trade Profit Calculator (beta)", expanded=False):
-    st.caption("Estimate blended rate to hit profit target based on team, utilisation, quotes→jobs, materials %, marketing, and overheads.")
-    weeks = st.number_input("Weeks in period", min_value=1.0, value=4.33, step=0.25)
-    mat_pct = st.number_input("Materials (COGS) % of revenue", min_value=0.0, max_value=95.0, value=25.0, step=1.0)
-    current_rate = st.number_input("Your current blended rate ($/hr)", min_value=0.0, value=120.0, step=5.0)
-    st.subheader("Team")
-    team = pd.DataFrame([
-        {"Person":"Tradie 1","Role":"Tradie","HourlyWageCost":40.0,"VanMonthly":1200.0,"PaidHoursPerWeek":38.0,"UtilisationPct":70.0,"QuotesPerWeek":3.0,"QuoteToJobPct":40.0,"AvgJobHours":2.0},
-        {"Person":"Apprentice 1","Role":"Apprentice","HourlyWageCost":25.0,"VanMonthly":0.0,"PaidHoursPerWeek":38.0,"UtilisationPct":65.0,"QuotesPerWeek":1.0,"QuoteToJobPct":35.0,"AvgJobHours":1.5},
-    ])
-    team = st.data_editor(team, num_rows="dynamic", use_container_width=True, hide_index=True)
-    team = team.fillna(0.0)
-    col1,col2 = st.columns(2)
-    with col1: mkt = st.number_input("Marketing ($/month)", min_value=0.0, value=2000.0, step=100.0)
-    with col2: oth = st.number_input("Other overheads ($/month)", min_value=0.0, value=8000.0, step=100.0)
-    t1,t2,t3 = st.columns(3)
-    with t1: hours_source = st.selectbox("Use hours from", ["Capacity (utilisation)","Demand (quotes→jobs)"])
-    with t2: target_mode = st.selectbox("Target type", ["Profit $","Profit Margin %"])
-    with t3: target_profit = st.number_input("Target profit ($)", min_value=0.0, value=10000.0, step=500.0)
-    margin_pct = st.slider("Target margin % (if using margin)", min_value=0, max_value=70, value=20, step=1)
-
-    team["PaidHoursPeriod"] = team["PaidHoursPerWeek"] * weeks
-    team["BillableHoursPeriod"] = team["PaidHoursPeriod"] * (team["UtilisationPct"]/100.0)
-    team["JobsFromQuotes"] = (team["QuotesPerWeek"] * weeks) * (team["QuoteToJobPct"]/100.0)
-    team["BillableFromJobs"] = team["JobsFromQuotes"] * team["AvgJobHours"]
-    H = float(team["BillableHoursPeriod"].sum()) if hours_source.startswith("Capacity") else float(team["BillableFromJobs"].sum())
-
-    team["WageCostPeriod"] = team["HourlyWageCost"] * team["PaidHoursPeriod"]
-    team["VanCostPeriod"]  = team["VanMonthly"] * (weeks/4.33)
-    people_costs = float((team["WageCostPeriod"] + team["VanCostPeriod"]).sum())
-    mkt_p = mkt * (weeks/4.33); oth_p = oth * (weeks/4.33); m = mat_pct/100.0
-
-    if target_mode=="Profit $":
-        req_rate = ((target_profit + people_costs + mkt_p + oth_p) / max(H*(1-m), 1e-6)) if H>0 else 0.0
-    else:
-        M = margin_pct/100.0; denom = (1 - m - M)
-        req_rate = ((people_costs + mkt_p + oth_p) / max(H*denom, 1e-6)) if H>0 else 0.0
-
-    revenue_at_current = current_rate * H
-    profit_at_current  = revenue_at_current - (m*revenue_at_current) - people_costs - mkt_p - oth_p
-    margin_at_current  = (profit_at_current/revenue_at_current*100.0) if revenue_at_current>0 else 0.0
-
-    s1,s2,s3 = st.columns(3)
-    with s1: st.metric("Billable hours (period)", f"{H:,.1f}")
-    with s2: st.metric("Required blended rate", f"${req_rate:,.2f}/hr")
-    with s3: st.metric("At current rate", f"Profit ${profit_at_current:,.0f} ({margin_at_current:,.1f}%)")
-
-    st.subheader("Per‑person contribution (at required rate)")
-    share = team[["Person","BillableHoursPeriod" if hours_source.startswith("Capacity") else "BillableFromJobs"]].copy()
-    share = share.rename(columns={"BillableHoursPeriod":"BillableHrs","BillableFromJobs":"BillableHrs"})
-    share["RevenueAtRequired"] = req_rate * share["BillableHrs"]
-    share["WageCostPeriod"] = team["WageCostPeriod"]
-    share["VanCostPeriod"]  = team["VanCostPeriod"]
-    tot_rev = float(share["RevenueAtRequired"].sum())
-    if tot_rev>0:
-        share["COGS"] = m * share["RevenueAtRequired"]
-        share["OverheadsAlloc"] = (mkt_p + oth_p) * (share["RevenueAtRequired"]/tot_rev)
-    else:
-        share["COGS"]=0.0; share["OverheadsAlloc"]=0.0
-    share["Profit"] = share["RevenueAtRequired"] - share["COGS"] - share["WageCostPeriod"] - share["VanCostPeriod"] - share["OverheadsAlloc"]
-    st.dataframe(share, use_container_width=True)
-
-# Persist profile on every interaction
-storage_write_profile(st.session_state.business_name, profile)
+@st.fragment
+def trade_calculator_section():
+    with st.expander("Trade Profit Calculator (beta)", expanded=False):
+        st.caption("Estimate blended rate to hit profit target based on team, utilisation, quotes→jobs, materials %, marketing, and overheads.")
+        weeks = st.number_input("Weeks in period", min_value=1.0, value=4.33, step=0.25)
+        mat_pct = st.number_input("Materials (COGS) % of revenue", min_value=0.0, max_value=95.0, value=25.0, step=1.0)
+        current_rate = st.number_input("Your current blended rate ($/hr)", min_value=0.0, value=120.0, step=5.0)
+        st.subheader("Team")
+        team = pd.DataFrame([
+            {"Person":"Tradie 1","Role":"Tradie","HourlyWageCost":40.0,"VanMonthly":1200.0,"PaidHoursPerWeek":38.0,"UtilisationPct":70.0,"QuotesPerWeek":3.0,"QuoteToJobPct":40.0,"AvgJobHours":2.0},
+            {"Person":"Apprentice 1","Role":"Apprentice","HourlyWageCost":25.0,"VanMonthly":0.0,"PaidHoursPerWeek":38.0,"UtilisationPct":65.0,"QuotesPerWeek":1.0,"QuoteToJobPct":35.0,"AvgJobHours":1.5},
+        ])
+        team = st.data_editor(team, num_rows="dynamic", use_container_width=True, hide_index=True)
+        team = team.fillna(0.0)
+        col1,col2 = st.columns(2)
+        with col1: mkt = st.number_input("Marketing ($/month)", min_value=0.0, value=2000.0, step=100.0)
+        with col2: oth = st.number_input("Other overheads ($/month)", min_value=0.0, value=8000.0, step=100.0)
+        t1,t2,t3 = st.columns(3)
+        with t1: hours_source = st.selectbox("Use hours from", ["Capacity (utilisation)","Demand (quotes→jobs)"])
+        with t2: target_mode = st.selectbox("Target type", ["Profit $","Profit Margin %"])
+        with t3: target_profit = st.number_input("Target profit ($)", min_value=0.0, value=10000.0, step=500.0)
+        margin_pct = st.slider("Target margin % (if using margin)", min_value=0, max_value=70, value=20, step=1)
+
+        team["PaidHoursPeriod"] = team["PaidHoursPerWeek"] * weeks
+        team["BillableHoursPeriod"] = team["PaidHoursPeriod"] * (team["UtilisationPct"]/100.0)
+        team["JobsFromQuotes"] = (team["QuotesPerWeek"] * weeks) * (team["QuoteToJobPct"]/100.0)
+        team["BillableFromJobs"] = team["JobsFromQuotes"] * team["AvgJobHours"]
+        H = float(team["BillableHoursPeriod"].sum()) if hours_source.startswith("Capacity") else float(team["BillableFromJobs"].sum())
+
+        team["WageCostPeriod"] = team["HourlyWageCost"] * team["PaidHoursPeriod"]
+        team["VanCostPeriod"]  = team["VanMonthly"] * (weeks/4.33)
+        people_costs = float((team["WageCostPeriod"] + team["VanCostPeriod"]).sum())
+        mkt_p = mkt * (weeks/4.33); oth_p = oth * (weeks/4.33); m = mat_pct/100.0
+
+        if target_mode=="Profit $":
+            req_rate = ((target_profit + people_costs + mkt_p + oth_p) / max(H*(1-m), 1e-6)) if H>0 else 0.0
+        else:
+            M = margin_pct/100.0; denom = (1 - m - M)
+            req_rate = ((people_costs + mkt_p + oth_p) / max(H*denom, 1e-6)) if H>0 else 0.0
+
+        revenue_at_current = current_rate * H
+        profit_at_current  = revenue_at_current - (m*revenue_at_current) - people_costs - mkt_p - oth_p
+        margin_at_current  = (profit_at_current/revenue_at_current*100.0) if revenue_at_current>0 else 0.0
+
+        s1,s2,s3 = st.columns(3)
+        with s1: st.metric("Billable hours (period)", f"{H:,.1f}")
+        with s2: st.metric("Required blended rate", f"${req_rate:,.2f}/hr")
+        with s3: st.metric("At current rate", f"Profit ${profit_at_current:,.0f} ({margin_at_current:,.1f}%)")
+
+        st.subheader("Per‑person contribution (at required rate)")
+        # built once from arrays instead of copying a slice of team and growing it column by column
+        hrs = team["BillableHoursPeriod" if hours_source.startswith("Capacity") else "BillableFromJobs"].to_numpy(dtype=float)
+        rev_req = req_rate * hrs
+        wage = team["WageCostPeriod"].to_numpy(dtype=float); van = team["VanCostPeriod"].to_numpy(dtype=float)
+        tot_rev = float(rev_req.sum())
+        if tot_rev>0:
+            cogs = m * rev_req
+            ovh = (mkt_p + oth_p) * (rev_req/tot_rev)
+        else:
+            cogs = np.zeros_like(rev_req); ovh = np.zeros_like(rev_req)
+        share = pd.DataFrame({"Person": team["Person"], "BillableHrs": hrs, "RevenueAtRequired": rev_req,
+                              "WageCostPeriod": wage, "VanCostPeriod": van, "COGS": cogs, "OverheadsAlloc": ovh,
+                              "Profit": rev_req - cogs - wage - van - ovh}, index=team.index)
+        st.dataframe(share, use_container_width=True)
+
+trade_calculator_section()
+
+# Persist profile whenever its content changed since the last autosave
+_saved_hash = _content_hash([st.session_state.business_name, profile])
+if st.session_state.get("_saved_hash") != _saved_hash:
+    if storage_write_profile(st.session_state.business_name, profile):
+        st.session_state["_saved_hash"] = _saved_hash